@@ -1,7 +1,14 @@
 import streamlit as st
 from supabase import create_client
+from postgrest.types import ReturnMethod
 import pandas as pd
 import hashlib
+import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Load credentials from Streamlit secrets
 SUPABASE_URL = st.secrets["SUPABASE_URL"]
@@ -9,6 +16,13 @@ SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
 print(f"Debug: SUPABASE_URL - {SUPABASE_URL}")  # Debugging log
 print(f"Debug: SUPABASE_KEY - {SUPABASE_KEY[:5]}...")  # Masked for security
 
+# How long a page keeps its session copy of the Employees/Courses table
+SESSION_TABLE_TTL_SECONDS = 60
+
+# Report result cache limits
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = 600
+
 # Connect to Supabase
 try:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -16,6 +30,407 @@ try:
 except Exception as e:
     print(f"Error: Failed to create Supabase client - {e}")  # Debugging log
 
+def format_employees(data):
+    """
+    Converts raw Employees rows into the DataFrame shown in the Employees Table.
+    """
+    employees = pd.DataFrame(data)
+    # Renames columns for better readability
+    employees = employees.rename(
+        columns={
+            "Adm_num": "Employee ID",
+            "EE_NameF": "First Name",
+            "EE_NameL": "Last Name",
+            "EE_HireDate": "Hire Date",
+            "EE_TermDate": "Termination Date",
+            "EE_StatusCode": "Status",
+        }
+    )
+    return employees[["Employee ID", "First Name", "Last Name", "Hire Date", "Termination Date", "Status"]]
+
+def format_courses(data):
+    """
+    Converts raw EmployeeActivityType rows into the DataFrame shown in the Courses Table.
+    """
+    courses = pd.DataFrame(data)
+    # Rename columns for better readability
+    courses = courses.rename(
+        columns={
+            "ID": "Course ID",
+            "EAT_ActivityCode": "Training Code",
+            "EAT_ActivityType": "Course Name",
+        }
+    )
+
+    # Map Training Code values to their corresponding labels
+    training_code_map = {1: "OSHA", 2: "Technical"}
+    courses["Training Code"] = courses["Training Code"].map(training_code_map)
+    return courses[["Course ID", "Training Code", "Course Name"]]
+
+def load_session_table(cache_key, fetch, refresh=False, hold=False):
+    """
+    Returns the table cached in session state, fetching it again when asked to,
+    when it is missing or empty, or once it is older than SESSION_TABLE_TTL_SECONDS.
+    With hold=True the TTL refresh is skipped, keeping the table frozen for an
+    editor with pending edits.
+    """
+    table = st.session_state.get(cache_key)
+    fetched_at = st.session_state.get(f"{cache_key}_fetched_at", 0)
+    expired = not hold and time.monotonic() - fetched_at > SESSION_TABLE_TTL_SECONDS
+    if refresh or table is None or table.empty or expired:
+        table = fetch()
+        st.session_state[cache_key] = table
+        st.session_state[f"{cache_key}_fetched_at"] = time.monotonic()
+    return table
+
+def patch_cached_table(cache_key, updates, key_column):
+    """
+    Merges the rows returned by a write into the table cached in session state,
+    replacing rows with a matching key and appending new ones.
+    """
+    table = st.session_state[cache_key]
+    for _, row in updates.iterrows():
+        match = table.index[table[key_column].astype(str) == str(row[key_column])]
+        if len(match) > 0:
+            table.loc[match[0], updates.columns] = row.values
+        else:
+            table = pd.concat([table, row.to_frame().T], ignore_index=True)
+    st.session_state[cache_key] = table
+    print(f"Debug: Patched cached table {cache_key} with {len(updates)} row(s)")  # Debugging log
+    return table
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_active_roster():
+    """
+    Returns the active employees used for course sign-in. Terminated employees are
+    filtered out by the database so the payload scales with active headcount;
+    employees with no status are kept, as before. Recommended (not yet applied)
+    partial index on the Employees table to serve this filter:
+    CREATE INDEX employees_active_idx ON "Employees" ("Adm_num")
+        WHERE "EE_StatusCode" IS NULL OR "EE_StatusCode" <> 'Terminated';
+    """
+    response = (
+        supabase.table("Employees")
+        .select("Adm_num, EE_NameF, EE_NameL")
+        .or_("EE_StatusCode.is.null,EE_StatusCode.neq.Terminated")
+        .order("Adm_num")
+        .execute()
+    )
+    print(f"Debug: Fetched active roster - {len(response.data)} employees")  # Debugging log
+    return response.data
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_employee_directory():
+    """
+    Returns every employee (including terminated ones) for history lookups.
+    """
+    response = supabase.table("Employees").select("Adm_num, EE_NameF, EE_NameL").execute()
+    print(f"Debug: Fetched employee directory - {len(response.data)} employees")  # Debugging log
+    return response.data
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_course_types():
+    """
+    Returns the course reference data shared by the sign-in, history and recertification pages.
+    """
+    response = supabase.table("EmployeeActivityType").select("ID, EAT_ActivityCode, EAT_ActivityType").execute()
+    print(f"Debug: Fetched course types - {len(response.data)} courses")  # Debugging log
+    return response.data
+
+@st.cache_resource
+def get_snapshot_generations():
+    """
+    Returns the per-loader generation counters, bumped each time a cached snapshot is
+    cleared, and the lock guarding them. Prefetches use them to spot stale results.
+    """
+    return {}, threading.Lock()
+
+def snapshot_generation(loader):
+    """
+    Returns the current generation of a cached loader's snapshot.
+    """
+    generations, lock = get_snapshot_generations()
+    with lock:
+        return generations.get(loader.__name__, 0)
+
+def clear_snapshot(loader):
+    """
+    Drops a cached loader's snapshot and bumps its generation.
+    """
+    generations, lock = get_snapshot_generations()
+    with lock:
+        generations[loader.__name__] = generations.get(loader.__name__, 0) + 1
+        loader.clear()
+
+def invalidate_employee_snapshots():
+    """
+    Drops the cached employee snapshots after an employee is written.
+    """
+    clear_snapshot(fetch_active_roster)
+    clear_snapshot(fetch_employee_directory)
+
+class CompletionIndex:
+    """
+    Course completion index: the latest EA_ActivityDate for each (employee, course)
+    pair. It is shared across sessions, so every access goes through the lock.
+    """
+
+    def __init__(self):
+        self.latest = None  # None until built
+        self.pending = None  # Completions recorded while a build is running
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def ensure_built(self):
+        with self.build_lock:
+            if self.latest is None:
+                self.build()
+
+    def build(self):
+        with self.lock:
+            self.pending = []
+        latest = {}
+        try:
+            start = 0  # Start index for pagination
+            batch_size = 1000  # Number of rows to fetch per batch
+            while True:
+                # Order on every indexed column so offset paging is deterministic; rows still
+                # tied on all three are interchangeable for the index
+                data = (
+                    supabase.table("EmployeeActivity")
+                    .select("EA_Adm_num, EA_Activity, EA_ActivityDate")
+                    .order("EA_ActivityDate")
+                    .order("EA_Adm_num")
+                    .order("EA_Activity")
+                    .range(start, start + batch_size - 1)
+                    .execute()
+                    .data
+                )
+                if not data:
+                    break
+                for row in data:
+                    if row["EA_ActivityDate"]:
+                        record_completion(latest, row["EA_Adm_num"], row["EA_Activity"], row["EA_ActivityDate"])
+                start += batch_size
+        finally:
+            with self.lock:
+                pending, self.pending = self.pending, None
+        with self.lock:
+            for employee_id, course_id, activity_date in pending:
+                record_completion(latest, employee_id, course_id, activity_date)
+            self.latest = latest
+        print(f"Debug: Built completion index - {len(latest)} (employee, course) pairs")  # Debugging log
+
+    def record(self, employee_id, course_id, activity_date):
+        with self.lock:
+            if self.latest is not None:
+                record_completion(self.latest, employee_id, course_id, activity_date)
+            elif self.pending is not None:
+                self.pending.append((employee_id, course_id, activity_date))
+            # Otherwise the index is not built yet and the next build reads the new rows
+
+    def items(self):
+        with self.lock:
+            return list(self.latest.items()) if self.latest is not None else []
+
+    def reset(self):
+        with self.lock:
+            self.latest = None
+
+@st.cache_resource
+def get_completion_index():
+    """
+    Returns the process-wide course completion index, which may not be built yet.
+    """
+    return CompletionIndex()
+
+def load_completion_index():
+    """
+    Returns the course completion index, building it on first use.
+    """
+    index = get_completion_index()
+    index.ensure_built()
+    return index
+
+def record_completion(latest, employee_id, course_id, activity_date):
+    """
+    Records a course completion in latest if it is newer than the one already stored.
+    """
+    key = (str(employee_id), str(course_id))
+    completed = datetime.date.fromisoformat(str(activity_date)[:10])
+    if key not in latest or latest[key] < completed:
+        latest[key] = completed
+
+class ResultCache:
+    """
+    LRU cache for report query results, bounded by total size in bytes and entry age.
+    """
+
+    def __init__(self, max_bytes, ttl_seconds):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (stored_at, size, value)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # Bumped by invalidate() so in-flight loads can be discarded
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, generation):
+        size = estimate_size(value)
+        with self.lock:
+            if generation != self.generation:
+                return  # Invalidated while the value was loading, so it may be stale
+            if key in self.entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # Too large to cache at all
+            self.entries[key] = (time.monotonic(), size, value)
+            self.total_bytes += size
+            # Evict least recently used reports until we are back under the limit
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self.generation += 1
+        print("Debug: Result cache invalidated")  # Debugging log
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+def estimate_size(rows):
+    """
+    Estimates the memory held by a list of result rows.
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for key, value in row.items():
+            size += sys.getsizeof(key) + (estimate_size([value]) if isinstance(value, dict) else sys.getsizeof(value))
+    return size
+
+@st.cache_resource
+def get_result_cache():
+    """
+    Returns the process-wide report result cache.
+    """
+    return ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+def cached_report(key, loader):
+    """
+    Returns the rows for a report, loading and caching them on a miss.
+    Keys are (report, training code, course or "All", employee, date range).
+    """
+    cache = get_result_cache()
+    generation = cache.generation  # Read before loading so a concurrent invalidate() wins
+    rows = cache.get(key)
+    if rows is None:
+        print(f"Debug: Result cache miss - {key}")  # Debugging log
+        rows = loader()
+        cache.put(key, rows, generation)
+    return rows
+
+def collect_employee_changes(original, edited, default_term_date):
+    """
+    Compares the edited employees grid against the original table and returns the
+    Employees updates grouped by identical payload ({payload: [Adm_num, ...]}), a
+    summary of the values that will be written, and any validation errors.
+    Only the columns that were edited are written.
+    """
+    updates, summary, errors = {}, [], []
+    original = original.set_index(original["Employee ID"].astype(str))
+    column_names = {
+        "EE_NameF": "First Name",
+        "EE_NameL": "Last Name",
+        "EE_StatusCode": "Status",
+        "EE_TermDate": "Termination Date",
+    }
+
+    for _, row in edited.iterrows():
+        employee_id = str(row["Employee ID"])
+        before = original.loc[employee_id]
+        changed = [
+            column for column in ["First Name", "Last Name", "Status", "Termination Date"]
+            if str(row[column]) != str(before[column])
+        ]
+        if not changed:
+            continue
+
+        payload = {}
+        if "First Name" in changed or "Last Name" in changed:
+            if not str(row["First Name"]).strip() or not str(row["Last Name"]).strip():
+                errors.append(f"{employee_id}: First Name and Last Name are required.")
+                continue
+            if "First Name" in changed:
+                payload["EE_NameF"] = row["First Name"]
+            if "Last Name" in changed:
+                payload["EE_NameL"] = row["Last Name"]
+
+        # Status rules only apply when the status or termination date was edited, so
+        # name-only edits go through even for employees with no status
+        if "Status" in changed or "Termination Date" in changed:
+            status = row["Status"]
+            if status == "Active":
+                if "Termination Date" in changed:
+                    errors.append(f"{employee_id}: Set Status to Terminated to give a Termination Date.")
+                    continue
+                if "Status" in changed:
+                    payload["EE_StatusCode"] = "Active"
+                    payload["EE_TermDate"] = "9999-12-31"  # Reset Term Date for Active employees
+            elif status == "Terminated":
+                term_date = str(row["Termination Date"]).strip()
+                if term_date in ("", "None", "9999-12-31"):
+                    term_date = default_term_date.strftime("%Y-%m-%d")
+                try:
+                    parsed_term_date = datetime.date.fromisoformat(term_date)
+                except ValueError:
+                    errors.append(f"{employee_id}: Termination Date '{term_date}' is not a valid YYYY-MM-DD date.")
+                    continue
+                hire_date = str(row["Hire Date"])[:10]
+                if row["Hire Date"] and parsed_term_date < datetime.date.fromisoformat(hire_date):
+                    errors.append(f"{employee_id}: Termination Date is before the Hire Date.")
+                    continue
+                if "Status" in changed:
+                    payload["EE_StatusCode"] = "Terminated"
+                payload["EE_TermDate"] = term_date
+            else:
+                errors.append(f"{employee_id}: Status must be Active or Terminated.")
+                continue
+
+        # Convert NumPy scalars from the grid so the IDs serialize in the request
+        adm_num = row["Employee ID"].item() if hasattr(row["Employee ID"], "item") else row["Employee ID"]
+        updates.setdefault(tuple(sorted(payload.items())), []).append(adm_num)
+        summary.append(
+            {
+                "Employee ID": row["Employee ID"],
+                "Employee Name": f"{payload.get('EE_NameF', before['First Name'])} {payload.get('EE_NameL', before['Last Name'])}",
+                "Changes": ", ".join(
+                    f"{column_names[column]}: {before[column_names[column]]} -> {value}" for column, value in payload.items()
+                ),
+            }
+        )
+
+    updates = [(dict(payload), ids) for payload, ids in updates.items()]
+    print(f"Debug: Collected {len(summary)} employee change(s) in {len(updates)} update(s), {len(errors)} error(s)")  # Debugging log
+    return updates, summary, errors
+
 def view_employees():
     """
     Displays a list of employees in a table format and allows the user to add or edit employees.
@@ -26,20 +441,16 @@ def view_employees():
     # Fetch employee data
     def fetch_employees():
         try:
-            response = supabase.table("Employees").select("Adm_num, EE_NameF, EE_NameL, EE_HireDate, EE_TermDate, EE_StatusCode").execute()
-            employees = pd.DataFrame(response.data)
-            print(f"Debug: Fetched employees data - {employees}")  # Debugging log
-            # Renames columns for better readability
-            employees = employees.rename(
-                columns={
-                    "Adm_num": "Employee ID",
-                    "EE_NameF": "First Name",
-                    "EE_NameL": "Last Name",
-                    "EE_HireDate": "Hire Date",
-                    "EE_TermDate": "Termination Date",
-                    "EE_StatusCode": "Status",
-                }
+            response = (
+                supabase.table("Employees")
+                .select("Adm_num, EE_NameF, EE_NameL, EE_HireDate, EE_TermDate, EE_StatusCode")
+                .order("Adm_num")  # Stable row order, so refetches do not reshuffle the table
+                .execute()
             )
+            print(f"Debug: Fetched employees data - {len(response.data)} employees")  # Debugging log
+            if not response.data:
+                return pd.DataFrame()
+            employees = format_employees(response.data)
             print(f"Debug: Renamed employees columns - {employees.columns}")  # Debugging log
 
             return employees
@@ -48,17 +459,31 @@ def view_employees():
             print(f"Error: Failed to fetch employees data - {e}")  # Debugging log
             return pd.DataFrame()
 
-    # Fetch and display the employees table
-    employees = fetch_employees()
+    # Fetch the employees table into the session; writes patch it in place
+    refresh_employees = st.sidebar.button("Refresh Employees")
+    # Keep the bulk editor's base table frozen while it has unsaved edits; refetching it
+    # would change the editor's widget id and discard them
+    pending_edits = st.session_state.get("bulk_edit_employees", {}).get("edited_rows")
+    employees = load_session_table(
+        "employees_table", fetch_employees, refresh=refresh_employees, hold=bool(pending_edits)
+    )
     if employees.empty:
         st.warning("No employees found in the database.")
         return
 
     # Use a placeholder to allow dynamic updates to the table
     table_placeholder = st.empty()
-    with table_placeholder.container():
-        st.subheader("Employees Table")
-        st.dataframe(employees, hide_index=True)
+
+    def render_employees(employees):
+        with table_placeholder.container():
+            st.subheader("Employees Table")
+            active_tab, archive_tab = st.tabs(["Active", "Terminated (Archive)"])
+            with active_tab:
+                st.dataframe(employees[employees["Status"] != "Terminated"], hide_index=True)
+            with archive_tab:
+                st.dataframe(employees[employees["Status"] == "Terminated"], hide_index=True)
+
+    render_employees(employees)
 
     # Add new employee
     st.subheader("Add New Employee")
@@ -74,7 +499,7 @@ def view_employees():
                 hire_date_str = hire_date.strftime("%Y-%m-%d")
 
                 # Insert new employee with default values for EE_TermDate and EE_StatusCode
-                supabase.table("Employees").insert(
+                response = supabase.table("Employees").insert(
                     {
                         "Adm_num": emp_id,
                         "EE_NameF": emp_fname,
@@ -82,20 +507,72 @@ def view_employees():
                         "EE_HireDate": hire_date_str,
                         "EE_TermDate": "9999-12-31",  # Automatically set Terminal Date
                         "EE_StatusCode": "Active",    # Automatically set Status Code
-                    }
+                    },
+                    returning=ReturnMethod.representation,
                 ).execute()
                 st.success("Employee added!")
                 print("Debug: Employee added successfully")  # Debugging log
+                invalidate_employee_snapshots()  # Roster changed, drop the cached snapshots
 
-                # Refresh the employees table
-                employees = fetch_employees()
-                with table_placeholder.container():
-                    st.subheader("Employees Table")
-                    st.dataframe(employees)
+                # Patch the cached table with the inserted row instead of re-fetching it
+                employees = patch_cached_table("employees_table", format_employees(response.data), "Employee ID")
+                render_employees(employees)
             except Exception as e:
                 st.error("Failed to add employee")
                 print(f"Error: Failed to add employee - {e}")  # Debugging log
-                
+
+    # Bulk edit mode replaces the single-employee editor with an editable grid
+    if st.toggle("Bulk Edit Mode"):
+        st.subheader("Bulk Edit Employees")
+        default_term_date = st.date_input("Default Termination Date", help="Used for employees set to Terminated without a date.")
+        edited_employees = st.data_editor(
+            employees,
+            hide_index=True,
+            disabled=["Employee ID", "Hire Date"],
+            column_config={
+                "Status": st.column_config.SelectboxColumn("Status", options=["Active", "Terminated"], required=True),
+            },
+            key="bulk_edit_employees",
+        )
+
+        if st.button("Apply Changes"):
+            updates, summary, errors = collect_employee_changes(employees, edited_employees, default_term_date)
+            if errors:
+                # Validate the whole batch before writing anything
+                st.error("No changes were saved. Please fix the following:\n\n" + "\n".join(f"- {e}" for e in errors))
+            elif not updates:
+                st.info("No changes to apply.")
+            else:
+                batch_size = 500  # Number of employees to update per request
+                updated = []
+                try:
+                    # Employees sharing a payload (e.g. a bulk terminate) are updated together
+                    for payload, ids in updates:
+                        for start in range(0, len(ids), batch_size):
+                            response = (
+                                supabase.table("Employees")
+                                .update(payload, returning=ReturnMethod.representation)
+                                .in_("Adm_num", ids[start:start + batch_size])
+                                .execute()
+                            )
+                            updated.extend(response.data)
+                    print(f"Debug: Bulk updated {len(updated)} employees")  # Debugging log
+                    st.success(f"Updated {len(summary)} employee(s).")
+                    st.dataframe(pd.DataFrame(summary), hide_index=True)
+                except Exception as e:
+                    st.error(
+                        f"Failed to apply bulk changes. {len(updated)} of {len(summary)} employee(s) were saved "
+                        "before the failure; the Employees Table shows what was saved."
+                    )
+                    print(f"Error: Failed to apply bulk changes after {len(updated)} rows - {e}")  # Debugging log
+
+                # Reflect whatever was written, even after a partial failure
+                if updated:
+                    invalidate_employee_snapshots()  # Roster changed, drop the cached snapshots
+                    employees = patch_cached_table("employees_table", format_employees(updated), "Employee ID")
+                    render_employees(employees)
+        return
+
     # Edit existing employee
     st.subheader("Edit Existing Employee")
     # Update the dropdown to include Employee ID, First Name, and Last Name
@@ -107,7 +584,8 @@ def view_employees():
         print(f"Debug: Selected Employee ID - {selected_employee_id}")  # Debugging log
         print(f"Debug: Type of Selected Employee ID - {type(selected_employee_id)}")  # Debugging log
 
-        # Ensure Employee ID column is an integer
+        # Ensure Employee ID column is an integer, without changing the cached table
+        employees = employees.copy()
         employees["Employee ID"] = employees["Employee ID"].astype(int)
 
         # Filter the DataFrame for the selected employee
@@ -156,15 +634,19 @@ def view_employees():
                     update_data["EE_TermDate"] = "9999-12-31"  # Reset Term Date for Active employees
 
                 # Update the employee record in the database
-                supabase.table("Employees").update(update_data).eq("Adm_num", selected_employee_id).execute()
+                response = (
+                    supabase.table("Employees")
+                    .update(update_data, returning=ReturnMethod.representation)
+                    .eq("Adm_num", selected_employee_id)
+                    .execute()
+                )
                 st.success("Employee updated successfully!")
                 print("Debug: Employee updated successfully")  # Debugging log
+                invalidate_employee_snapshots()  # Roster changed, drop the cached snapshots
 
-                # Refresh the employees table
-                employees = fetch_employees()
-                with table_placeholder.container():
-                    st.subheader("Employees Table")
-                    st.dataframe(employees)
+                # Patch the cached table with the updated row instead of re-fetching it
+                employees = patch_cached_table("employees_table", format_employees(response.data), "Employee ID")
+                render_employees(employees)
             except Exception as e:
                 st.error("Failed to update employee")
                 print(f"Error: Failed to update employee - {e}")  # Debugging log
@@ -179,27 +661,23 @@ def sign_employee_into_course():
 
     # Fetch data
     try:
-        employees = supabase.table("Employees").select("Adm_num, EE_NameF, EE_NameL, EE_StatusCode").execute().data
-        courses = supabase.table("EmployeeActivityType").select("ID, EAT_ActivityCode, EAT_ActivityType").execute().data
-        print(f"Debug: Fetched employees - {employees}")  # Debugging log
+        active_employees = fetch_active_roster()
+        courses = fetch_course_types()
+        print(f"Debug: Fetched active employees - {active_employees}")  # Debugging log
         print(f"Debug: Fetched courses - {courses}")  # Debugging log
     except Exception as e:
         st.error("Failed to fetch data from the database.")
         print(f"Error: Failed to fetch data - {e}")  # Debugging log
-        employees, courses = [], []
+        active_employees, courses = [], []
 
     # Check if employees or courses are empty
-    if not employees:
-        st.warning("No employees found in the database. Please add employees first.")
+    if not active_employees:
+        st.warning("No active employees found in the database. Please add employees first.")
         return
     if not courses:
         st.warning("No courses found in the database. Please add courses first.")
         return
 
-    # Filter out terminated employees
-    active_employees = [e for e in employees if e["EE_StatusCode"] != "Terminated"]
-    print(f"Debug: Filtered active employees - {active_employees}")  # Debugging log
-
     # Step 1: Select Training Code
     training_code_selection = st.selectbox(
         "Select Training Code",
@@ -250,6 +728,7 @@ def sign_employee_into_course():
 
             # Button to sign in the employees
             if st.button("Sign In"):
+                signed_in = []  # Employee IDs whose activity row was written
                 try:
                     # Convert activity_date to string format
                     activity_date_str = activity_date.strftime("%Y-%m-%d")
@@ -270,12 +749,23 @@ def sign_employee_into_course():
                             "EA_ActivityHours": hours,  # Activity Hours
                             "EA_Comments": comments,  # Comments
                         }).execute()
+                        signed_in.append(employee_id)
 
                     st.success("Employees signed into course!")
+                    get_result_cache().invalidate()  # New attendance, drop cached history reports
                     print("Debug: Employees signed into course successfully")  # Debugging log
                 except Exception as e:
+                    get_result_cache().invalidate()  # Some rows may have been written before the failure
                     st.error("Failed to sign employees into course")
                     print(f"Error: Failed to sign employees into course - {e}")  # Debugging log
+
+                # Keep the completion index current; a failure here must not affect the sign-in
+                try:
+                    completion_index = get_completion_index()
+                    for employee_id in signed_in:
+                        completion_index.record(employee_id, course_id, activity_date_str)
+                except Exception as e:
+                    print(f"Error: Failed to update completion index - {e}")  # Debugging log
 def activity_history():
     """
     Displays the Activity History page with options to view Employee Course History and Course Attendance.
@@ -293,7 +783,7 @@ def activity_history():
 
         # Fetch employee data
         try:
-            employees = supabase.table("Employees").select("Adm_num, EE_NameF, EE_NameL").execute().data
+            employees = fetch_employee_directory()
             print(f"Debug: Fetched employees - {employees}")  # Debugging log
         except Exception as e:
             st.error("Failed to fetch employees from the database.")
@@ -318,8 +808,8 @@ def activity_history():
                 print(f"Debug: Selected Employee ID - {employee_id}")  # Debugging log
 
                 # Query to fetch employee history
-                try:
-                    query = (
+                def fetch_history():
+                    return (
                         supabase.table("EmployeeActivity")
                         .select(
                             "EA_Adm_num, EA_NameF, EA_NameL, EA_ActivityDate, EA_ActivityHours, EA_Comments, "
@@ -327,10 +817,12 @@ def activity_history():
                         )
                         .eq("EA_Adm_num", employee_id)
                         .execute()
+                        .data
                     )
 
-                    # Convert the query result to a DataFrame
-                    data = query.data
+                try:
+                    # Serve repeat views of the same report from the result cache
+                    data = cached_report(("Employee Course History", None, None, employee_id, None), fetch_history)
                     if data:
                         df = pd.DataFrame(data)
 
@@ -393,7 +885,7 @@ def activity_history():
 
         # Fetch course data
         try:
-            courses = supabase.table("EmployeeActivityType").select("ID, EAT_ActivityCode, EAT_ActivityType").execute().data
+            courses = fetch_course_types()
             print(f"Debug: Fetched courses - {courses}")  # Debugging log
         except Exception as e:
             st.error("Failed to fetch courses from the database.")
@@ -431,55 +923,40 @@ def activity_history():
                 )
                 print(f"Debug: Selected course from dropdown - {course_selection}")  # Debugging log
 
+                # Optional date range filter
+                date_range = st.date_input("Date Range", value=(), help="Leave empty to include all dates.")
+                date_range = tuple(d.strftime("%Y-%m-%d") for d in date_range) if len(date_range) == 2 else None
+
                 # Check if a valid course is selected
                 if course_selection != "":
-                    all_data = []  # List to store all rows
-                    start = 0  # Start index for pagination
-                    batch_size = 1000  # Number of rows to fetch per batch
-
                     if course_selection == "All":
                         # Fetch all data for the selected training code
                         print(f"Debug: Fetching all data for Training Code - {selected_training_code}")  # Debugging log
-
-                        while True:
-                            # Fetch a batch of rows
-                            query = (
-                                supabase.table("EmployeeActivity")
-                                .select("EA_Adm_num, EA_NameF, EA_NameL, EA_ActivityHours, EA_Comments, EA_ActivityDate")
-                                .in_("EA_Activity", [c["ID"] for c in filtered_courses])
-                                .order("EA_ActivityDate", desc=True)
-                                .range(start, start + batch_size - 1)
-                                .execute()
-                            )
-
-                            # Append the fetched data to the list
-                            data = query.data
-                            if not data:
-                                break  # Exit the loop if no more data is returned
-                            all_data.extend(data)
-
-                            # Move to the next batch
-                            start += batch_size
-
+                        course_ids = [c["ID"] for c in filtered_courses]
                     else:
                         # Extract course ID
                         course_id = course_selection.split(" - ")[0]
                         print(f"Debug: Extracted Course ID - {course_id}")  # Debugging log
+                        course_ids = [course_id]
+
+                    def fetch_attendance():
+                        all_data = []  # List to store all rows
+                        start = 0  # Start index for pagination
+                        batch_size = 1000  # Number of rows to fetch per batch
 
                         while True:
-                            # Fetch a batch of rows for the selected course
+                            # Fetch a batch of rows for the selected courses
                             query = (
                                 supabase.table("EmployeeActivity")
                                 .select("EA_Adm_num, EA_NameF, EA_NameL, EA_ActivityHours, EA_Comments, EA_ActivityDate")
-                                .eq("EA_Activity", course_id)
-                                .order("EA_ActivityDate", desc=True)
-                                .range(start, start + batch_size - 1)
-                                .execute()
+                                .in_("EA_Activity", course_ids)
                             )
+                            if date_range:
+                                query = query.gte("EA_ActivityDate", date_range[0]).lte("EA_ActivityDate", date_range[1])
+                            data = query.order("EA_ActivityDate", desc=True).range(start, start + batch_size - 1).execute().data
 
                             # Append the fetched data to the list
-                            data = query.data
-                            print(f"Debug: Fetched data batch - {data}")  # Debugging log
+                            print(f"Debug: Fetched data batch - {len(data)} rows")  # Debugging log
                             if not data:
                                 print("Debug: No more data returned, exiting loop.")  # Debugging log
                                 break  # Exit the loop if no more data is returned
@@ -487,6 +964,16 @@ def activity_history():
 
                             # Move to the next batch
                             start += batch_size
+                        return all_data
+
+                    # Serve repeat views of the same report from the result cache
+                    report_key = ("Course Attendance", training_code_selection, course_selection, None, date_range)
+                    try:
+                        all_data = cached_report(report_key, fetch_attendance)
+                    except Exception as e:
+                        st.error("Failed to fetch course attendance")
+                        print(f"Error: Failed to fetch course attendance - {e}")  # Debugging log
+                        all_data = []
 
                     print(f"Debug: Total rows fetched - {len(all_data)}")  # Debugging log
 
@@ -543,6 +1030,13 @@ def activity_history():
                         print(f"Debug: Displaying course attendance DataFrame - {df}")  # Debugging log
                     else:
                         st.warning("No records found for the selected course.")
+
+    cache = get_result_cache()
+    st.caption(
+        f"Report cache: {cache.hits} hits, {cache.misses} misses, "
+        f"{len(cache.entries)} reports, {cache.total_bytes / 1024:.0f} KB of {cache.max_bytes / (1024 * 1024):.0f} MB"
+    )
+
 def course_management():
     """
     Displays the Course Management page with options to view, add, and edit courses.
@@ -554,21 +1048,10 @@ def course_management():
     def fetch_courses():
         try:
             response = supabase.table("EmployeeActivityType").select("ID, EAT_ActivityCode, EAT_ActivityType").execute()
-            courses = pd.DataFrame(response.data)
-            print(f"Debug: Fetched courses data - {courses}")  # Debugging log
-
-            # Rename columns for better readability
-            courses = courses.rename(
-                columns={
-                    "ID": "Course ID",
-                    "EAT_ActivityCode": "Training Code",
-                    "EAT_ActivityType": "Course Name",
-                }
-            )
-
-            # Map Training Code values to their corresponding labels
-            training_code_map = {1: "OSHA", 2: "Technical"}
-            courses["Training Code"] = courses["Training Code"].map(training_code_map)
+            print(f"Debug: Fetched courses data - {len(response.data)} courses")  # Debugging log
+            if not response.data:
+                return pd.DataFrame()
+            courses = format_courses(response.data)
 
             print(f"Debug: Renamed courses columns - {courses.columns}")  # Debugging log
             print(f"Debug: Updated Training Code values - {courses['Training Code']}")  # Debugging log
@@ -579,17 +1062,22 @@ def course_management():
             print(f"Error: Failed to fetch courses data - {e}")  # Debugging log
             return pd.DataFrame()
 
-    # Fetch and display the courses table
-    courses = fetch_courses()
+    # Fetch the courses table into the session; writes patch it in place
+    refresh_courses = st.sidebar.button("Refresh Courses")
+    courses = load_session_table("courses_table", fetch_courses, refresh=refresh_courses)
     if courses.empty:
         st.warning("No courses found in the database.")
         return
 
     # Use a placeholder to allow dynamic updates to the table
     table_placeholder = st.empty()
-    with table_placeholder.container():
-        st.subheader("Courses Table")
-        st.dataframe(courses, hide_index=True)
+
+    def render_courses(courses):
+        with table_placeholder.container():
+            st.subheader("Courses Table")
+            st.dataframe(courses, hide_index=True)
+
+    render_courses(courses)
 
     # Add New Course
     st.subheader("Add New Course")
@@ -610,21 +1098,22 @@ def course_management():
                 print(f"Debug: Calculated next Course ID - {next_id}")  # Debugging log
 
                 # Insert new course into the database
-                supabase.table("EmployeeActivityType").insert(
+                response = supabase.table("EmployeeActivityType").insert(
                     {
                         "ID": next_id,  # Set the next Course ID
                         "EAT_ActivityCode": training_code_value,
                         "EAT_ActivityType": course_name,
-                    }
+                    },
+                    returning=ReturnMethod.representation,
                 ).execute()
                 st.success("Course added successfully!")
                 print("Debug: Course added successfully")  # Debugging log
+                clear_snapshot(fetch_course_types)  # Courses changed, drop the reference snapshot
+                get_result_cache().invalidate()  # Cached history reports include course names
 
-                # Refresh the courses table
-                courses = fetch_courses()
-                with table_placeholder.container():
-                    st.subheader("Courses Table")
-                    st.dataframe(courses)
+                # Patch the cached table with the inserted row instead of re-fetching it
+                courses = patch_cached_table("courses_table", format_courses(response.data), "Course ID")
+                render_courses(courses)
             except Exception as e:
                 st.error("Failed to add course")
                 print(f"Error: Failed to add course - {e}")  # Debugging log
@@ -669,19 +1158,201 @@ def course_management():
                 }
 
                 # Update the course record in the database
-                supabase.table("EmployeeActivityType").update(update_data).eq("ID", selected_course_id).execute()
+                response = (
+                    supabase.table("EmployeeActivityType")
+                    .update(update_data, returning=ReturnMethod.representation)
+                    .eq("ID", selected_course_id)
+                    .execute()
+                )
                 st.success("Course updated successfully!")
                 print("Debug: Course updated successfully")  # Debugging log
+                clear_snapshot(fetch_course_types)  # Courses changed, drop the reference snapshot
+                get_result_cache().invalidate()  # Cached history reports include course names
 
-                # Refresh the courses table
-                courses = fetch_courses()
-                with table_placeholder.container():
-                    st.subheader("Courses Table")
-                    st.dataframe(courses)
+                # Patch the cached table with the updated row instead of re-fetching it
+                courses = patch_cached_table("courses_table", format_courses(response.data), "Course ID")
+                render_courses(courses)
             except Exception as e:
                 st.error("Failed to update course")
                 print(f"Error: Failed to update course - {e}")  # Debugging log
                 
+# Recertification interval in months for courses without a configured interval;
+# 0 means the course does not need recertification
+DEFAULT_RECERTIFICATION_MONTHS = {"OSHA": 12, "Technical": 0}
+
+@st.cache_resource
+def get_recertification_intervals():
+    """
+    Returns the organisation-wide recertification intervals in months, keyed by course ID,
+    and the lock guarding them. They are shared by every session and held in memory,
+    so they reset to the defaults when the app restarts.
+    """
+    return {}, threading.Lock()
+
+def recertification_due():
+    """
+    Displays employees whose course certifications are overdue or due soon, based on
+    the latest completion of each course and a configurable recertification interval.
+    """
+    st.title("Recertification Due")
+    print("Debug: Entered recertification_due function")  # Debugging log
+
+    # Fetch data
+    try:
+        active_employees = fetch_active_roster()
+        courses = fetch_course_types()
+        completion_index = load_completion_index()
+    except Exception as e:
+        st.error("Failed to fetch data from the database.")
+        print(f"Error: Failed to fetch data - {e}")  # Debugging log
+        return
+
+    if st.sidebar.button("Rebuild Completion Index"):
+        get_completion_index().reset()
+        st.rerun()
+
+    # Select Training Code
+    training_code_selection = st.selectbox("Select Training Code", ["OSHA", "Technical"])
+    training_code_map = {"OSHA": 1, "Technical": 2}
+    filtered_courses = [c for c in courses if c.get("EAT_ActivityCode") == training_code_map[training_code_selection]]
+    if not filtered_courses:
+        st.warning("No courses found for the selected training code.")
+        return
+
+    # Recertification intervals are shared by every session
+    due_soon_days = st.number_input("Due Soon Window (Days)", min_value=0, value=30, step=5)
+    intervals, intervals_lock = get_recertification_intervals()
+    default_months = DEFAULT_RECERTIFICATION_MONTHS[training_code_selection]
+    with intervals_lock:
+        current_intervals = {str(c["ID"]): intervals.get(str(c["ID"]), default_months) for c in filtered_courses}
+    interval_table = pd.DataFrame(
+        [
+            {
+                "Course ID": c["ID"],
+                "Course Name": c["EAT_ActivityType"],
+                "Interval (Months)": current_intervals[str(c["ID"])],
+            }
+            for c in filtered_courses
+        ]
+    )
+    with st.expander("Recertification Intervals"):
+        st.caption(
+            "Intervals apply to all users. OSHA courses default to 12 months; Technical courses default to 0 "
+            "(no recertification) until an interval is set."
+        )
+        interval_table = st.data_editor(
+            interval_table,
+            hide_index=True,
+            disabled=["Course ID", "Course Name"],
+            column_config={
+                "Interval (Months)": st.column_config.NumberColumn("Interval (Months)", min_value=0, step=1),
+            },
+            key=f"recertification_intervals_{training_code_selection}",
+        )
+    # Save only the intervals edited here, so a stale grid cannot undo another user's change
+    with intervals_lock:
+        for _, row in interval_table.iterrows():
+            course_id = str(row["Course ID"])
+            if pd.notna(row["Interval (Months)"]) and int(row["Interval (Months)"]) != current_intervals[course_id]:
+                intervals[course_id] = int(row["Interval (Months)"])
+                current_intervals[course_id] = intervals[course_id]
+                print(f"Debug: Set recertification interval for course {course_id} - {intervals[course_id]} months")  # Debugging log
+
+    # Answer the query from the completion index instead of re-reading activity
+    employees_by_id = {str(e["Adm_num"]): e for e in active_employees}
+    course_names = {str(c["ID"]): c["EAT_ActivityType"] for c in filtered_courses}
+    today = datetime.date.today()
+    due_soon_date = today + datetime.timedelta(days=int(due_soon_days))
+
+    rows = []
+    for (employee_id, course_id), last_completed in completion_index.items():  # Snapshot taken under the lock
+        if employee_id not in employees_by_id or course_id not in course_names:
+            continue
+        interval_months = current_intervals[course_id]
+        if interval_months <= 0:
+            continue  # Courses with no interval do not need recertification
+        due_date = (pd.Timestamp(last_completed) + pd.DateOffset(months=interval_months)).date()
+        if due_date > due_soon_date:
+            continue
+        employee = employees_by_id[employee_id]
+        rows.append(
+            {
+                "Employee ID": employee["Adm_num"],
+                "Employee Name": f"{employee['EE_NameF']} {employee['EE_NameL']}",
+                "Course": course_names[course_id],
+                "Last Completed": last_completed,
+                "Due Date": due_date,
+                "Status": "Overdue" if due_date < today else "Due Soon",
+            }
+        )
+    print(f"Debug: Found {len(rows)} recertifications due")  # Debugging log
+
+    if not rows:
+        st.success("No recertifications are overdue or due soon.")
+        return
+
+    df = pd.DataFrame(rows).sort_values("Due Date")
+    overdue_col, due_soon_col = st.columns(2)
+    overdue_col.metric("Overdue", int((df["Status"] == "Overdue").sum()))
+    due_soon_col.metric("Due Soon", int((df["Status"] == "Due Soon").sum()))
+    st.dataframe(df, hide_index=True)
+
+# Data each page reads on load, and the pages a user usually opens next from each page
+PAGE_DATA = {
+    "Course Sign In": [fetch_active_roster, fetch_course_types],
+    "View Activity History": [fetch_employee_directory, fetch_course_types],
+    "Employee Management": [],
+    "Course Management": [],
+    "Recertification Due": [fetch_active_roster, fetch_course_types, load_completion_index],
+}
+LIKELY_NEXT_PAGES = {
+    "Course Sign In": ["View Activity History", "Recertification Due"],
+    "View Activity History": ["Course Sign In"],
+    "Employee Management": ["Course Sign In"],
+    "Course Management": ["Course Sign In", "View Activity History"],
+    "Recertification Due": ["View Activity History", "Course Sign In"],
+}
+
+@st.cache_resource
+def get_prefetcher():
+    """
+    Returns the process-wide prefetch executor, the in-flight prefetch jobs, and the
+    lock guarding them across sessions.
+    """
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch"), {}, threading.Lock()
+
+def prefetch_likely_next(current_page):
+    """
+    Warms the cached data for the pages likely to be opened after current_page in the
+    background, so navigating there renders from warm caches instead of fetching cold.
+    """
+    executor, in_flight, lock = get_prefetcher()
+    with lock:
+        for page in LIKELY_NEXT_PAGES.get(current_page, []):
+            for loader in PAGE_DATA[page]:
+                job = in_flight.get(loader.__name__)
+                if job is not None and not job.done():
+                    continue  # Already warming
+                in_flight[loader.__name__] = executor.submit(prefetch, loader)
+
+def prefetch(loader):
+    """
+    Runs one cached loader on a prefetch thread. Failures are logged and left to the page to surface.
+    Prefetched st.cache_data loaders must use show_spinner=False, as these threads have no page to draw on.
+    """
+    try:
+        generation = snapshot_generation(loader)
+        loader()
+        if snapshot_generation(loader) != generation:
+            # A write cleared the snapshot while this load ran, so what it cached may be
+            # stale; drop it and load again
+            print(f"Debug: Discarded stale prefetch of {loader.__name__}")  # Debugging log
+            loader.clear()
+            loader()
+        print(f"Debug: Prefetched {loader.__name__}")  # Debugging log
+    except Exception as e:
+        print(f"Error: Failed to prefetch {loader.__name__} - {e}")  # Debugging log
+
 def hash_password(password):
     """
     Hashes a password using SHA-256.
@@ -750,18 +1421,23 @@ def main():
                 "View Activity History",
                 "Employee Management",
                 "Course Management",
+                "Recertification Due",
             ],
             index=[
                 "Course Sign In",
                 "View Activity History",
                 "Employee Management",
                 "Course Management",
+                "Recertification Due",
             ].index(st.session_state["current_page"]),
         )
 
         # Check if the selected page has changed
         if option != st.session_state["current_page"]:
             st.session_state["current_page"] = option
+            # Pick up other users' edits when a management page is opened again
+            st.session_state.pop("employees_table", None)
+            st.session_state.pop("courses_table", None)
             st.rerun()  # Force a rerun to load the selected page
 
         # Dynamically render the selected page
@@ -773,6 +1449,11 @@ def main():
             view_employees()
         elif option == "Course Management":
             course_management()
+        elif option == "Recertification Due":
+            recertification_due()
+
+        # Warm the data for the pages the user is likely to open next while they idle here
+        prefetch_likely_next(option)
             
 if __name__ == "__main__":
     main()
\ No newline at end of file